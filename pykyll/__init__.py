@@ -1,14 +1,16 @@
 import os
+import re
 import sys
+import zlib
 import yaml
 import jinja2
 import logging
 import argparse
-import markdown
 import pkg_resources
 from shutil import copyfile
+from fnmatch import fnmatch
 from datetime import datetime, date
-from pykyll import preprocessors, dev_server
+from pykyll import preprocessors, converters, dev_server, manifests, link_checker
 
 try:
     __version__ = pkg_resources.get_distribution('pykyll').version
@@ -23,16 +25,11 @@ class Pykyller:
     """
     Main site builder
     """
-    md_converter = markdown.Markdown(
-        extensions=[
-            'markdown.extensions.fenced_code',
-            'markdown.extensions.tables',
-            preprocessors.FrontMatterExtension(),
-            preprocessors.CodeBlockExtension()
-        ]
-    )
+    listing_pattern = re.compile(r'site\s*(\.\s*|\[\s*[\'"])(posts|categories|tags)\b')
+    template_pattern = re.compile(r'{%-?\s*(?:extends|include|import|from)\s+[\'"]([^\'"]+)[\'"]')
 
-    def __init__(self, build_dir='build', templates_dir='templates', force_build=None):
+    def __init__(self, build_dir='build', templates_dir='templates', force_build=None, shard=None, clean=False,
+                 delta_file=None, only=None):
         self.tree = {}
         self.site_info = {
             'categories': {},
@@ -49,6 +46,7 @@ class Pykyller:
         self.ignore_dirs = (self.templates_dir, self.build_dir, 'pykyll', 'tests')
 
         self.jinja_env = jinja2.Environment(loader=jinja2.FileSystemLoader(self.templates_dir))
+        self.md_pool = converters.MarkdownPool()
 
         self.always_build = False
         self.force_build_files = []
@@ -57,6 +55,12 @@ class Pykyller:
         elif force_build is not None:  # []
             self.always_build = True
 
+        self.shard = shard  # (index, num_shards), with index starting at 1
+        self.clean = clean
+        self.delta_file = delta_file
+        self.only = only  # ['posts/2020/*', 'category:programming', 'tag:python']
+        self._listing_templates = {}
+
     def discover_pages(self):
         skip_prefixes = ('.', '_')
 
@@ -71,6 +75,10 @@ class Pykyller:
             if path and (any(p[0] in skip_prefixes for p in path) or path[0] in self.ignore_dirs):
                 continue
 
+            if manifests.manifest_name in files:  # another build dir, e.g. from a sharded build
+                dirs.clear()
+                continue
+
             for f in files:
                 if f[0] in skip_prefixes:
                     continue
@@ -131,19 +139,184 @@ class Pykyller:
             elif isinstance(v, dict):
                 self.traverse_tree(cls, func, v)
 
+    def in_shard(self, file):
+        """
+        Deterministically assign files to shards by hashing their source path, so that every machine running a sharded
+        build agrees on the partitioning without needing to coordinate.
+        """
+        if self.shard is None:
+            return True
+
+        index, num_shards = self.shard
+        return zlib.crc32(file.path.encode()) % num_shards == index - 1
+
+    def outputs(self):
+        """
+        Find all output paths, relative to the build dir, that this build is responsible for. If several files output
+        to the same path, the last one built overwrites the others. This is an error in a sharded build, since the
+        merge step has to be able to verify that each output path was produced only once.
+        :return: Output paths mapped to the File objects that produce them
+        """
+        sources = {}
+
+        def process_page(file):
+            if (isinstance(file, Page) and file.unpublished()) or not self.in_shard(file):
+                return
+
+            path = os.path.relpath(file.dest, self.build_dir).replace(os.path.sep, '/')
+            sources.setdefault(path, []).append(file)
+
+        self.traverse_tree(File, process_page)
+
+        duplicates = sorted(
+            '%s (from %s)' % (path, ', '.join(f.path for f in files)) for path, files in sources.items()
+            if len(files) > 1
+        )
+        if duplicates and self.shard:
+            raise manifests.ManifestError('Output paths produced more than once: %s' % ', '.join(duplicates))
+
+        for d in duplicates:
+            logger.warning('Output path produced more than once: %s' % d)
+
+        return {path: files[-1] for path, files in sources.items()}
+
+    def referenced_templates(self, source):
+        """Names of templates extended, included or imported in some Jinja source."""
+        return self.template_pattern.findall(source)
+
+    def template_lists_posts(self, name, seen=None):
+        """
+        Whether a template, or any template it references, uses site.posts, site.categories or site.tags.
+        """
+        if name in self._listing_templates:
+            return self._listing_templates[name]
+
+        seen = seen or set()
+        if name in seen:  # circular reference, which Jinja will complain about anyway
+            return False
+        seen.add(name)
+
+        try:
+            source = self.jinja_env.loader.get_source(self.jinja_env, name)[0]
+        except jinja2.TemplateNotFound:
+            return False
+
+        self._listing_templates[name] = bool(self.listing_pattern.search(source)) or \
+            any(self.template_lists_posts(t, seen) for t in self.referenced_templates(source))
+        return self._listing_templates[name]
+
+    def matches_selection(self, file):
+        """
+        Whether a file matches any of the selectors in self.only. These can be globs matched against the file's source
+        path, or category:<name> or tag:<name> to match posts by their front matter. Categories are matched
+        case-insensitively, since they're lower-cased in post URLs anyway.
+        """
+        metadata = getattr(file, 'metadata', {})
+        for selector in self.only:
+            if selector.startswith('category:'):
+                category = metadata.get('category')
+                if category and str(category).lower() == selector[len('category:'):].lower():
+                    return True
+            elif selector.startswith('tag:'):
+                if selector[len('tag:'):] in metadata.get('tags', []):
+                    return True
+            elif fnmatch(file.path, selector):
+                return True
+
+        return False
+
+    def select(self):
+        """
+        Find all files matching self.only, plus the pages that depend on them - i.e. the previous/next posts set by
+        process(), and any pages listing posts through site.posts, site.categories or site.tags if any selected pages
+        appear in them. Selected posts that are unpublished are treated as having just been removed from the post list,
+        so the posts either side of them and the listing pages are selected as well. Needs to be run after process().
+        :return: Source paths of the selected files
+        """
+        selected = {}
+
+        def select_file(file):
+            if self.matches_selection(file):
+                selected[file.path] = file
+
+        self.traverse_tree(File, select_file)
+        if not selected:
+            logger.warning('No files matched %s' % ', '.join(self.only))
+
+        selected_posts = [p for p in self.site_info['posts'] if p.path in selected]
+        for p in selected_posts:
+            for neighbour in (p.metadata['previous'], p.metadata['next']):
+                if neighbour is not None:
+                    selected[neighbour.path] = neighbour
+
+        # a selected post that has just been unpublished has left the post list, so the published posts either side of
+        # it and the listing pages still refer to it
+        unpublished_posts = [
+            p for p in self.tree.get('posts', {}).values()
+            if isinstance(p, Page) and p.unpublished() and p.path in selected
+        ]
+        for p in unpublished_posts:
+            if 'date' not in p.metadata:
+                continue
+
+            earlier = [q for q in self.site_info['posts'] if q.metadata['date'] < p.metadata['date']]
+            later = [q for q in self.site_info['posts'] if q.metadata['date'] >= p.metadata['date']]
+            for neighbour in earlier[-1:] + later[:1]:
+                selected[neighbour.path] = neighbour
+
+        # any published page with a category or tags is listed, not just those in posts/
+        listed_pages = {
+            p.path for pages in list(self.site_info['categories'].values()) + list(self.site_info['tags'].values())
+            for p in pages
+        }
+        if selected_posts or unpublished_posts or listed_pages.intersection(selected):
+            def process_page(page):
+                if page.path not in selected and not page.unpublished() and page.lists_posts():
+                    selected[page.path] = page
+
+            self.traverse_tree(Page, process_page)
+
+        logger.info('Selected %i files' % len(selected))
+        return set(selected)
+
     def build(self):
         """
-        Run build() on all File objects
+        Run build() on all File objects, then write a manifest of the build dir and work out which outputs were added,
+        modified or removed since the last build. If this is a sharded build, only build files in this shard. If
+        self.only is set, only build the selected files and their dependents, regardless of whether they're up to date.
         """
-        logger.info('Building site')
+        if self.shard:
+            logger.info('Building site, shard %i of %i' % self.shard)
+        else:
+            logger.info('Building site')
+
+        # find outputs before building anything, so that a sharded build fails early on duplicate output paths
+        outputs = self.outputs()
+        selection = self.select() if self.only else None
 
         def process_page(file):
-            if file.should_build():
+            if not self.in_shard(file):
+                return
+
+            if selection is None:
+                build = file.should_build()
+            else:
+                build = file.path in selection and not (isinstance(file, Page) and file.unpublished())
+
+            if build:
                 logger.info('Building %s' % file)
                 file.build()
 
         self.traverse_tree(File, process_page)
 
+        manifests.update_manifest(
+            self.build_dir,
+            {k: v.path for k, v in outputs.items()},
+            shard=self.shard,
+            clean=self.clean,
+            delta_file=self.delta_file
+        )
+
         logger.info('Done')
 
     def process(self):
@@ -229,10 +402,16 @@ class File:
 
 
 class Page(File):
+    """
+    Only front matter is read when a Page is created, so that the whole site can be discovered and processed cheaply.
+    Conversion and templating are deferred until the content is actually needed, i.e. when the page is built.
+    """
+
     def __init__(self, path, builder):
         self.metadata = {}
         super().__init__(path, builder)
-        self.content = self._load_content()
+        self._content = None
+        self.metadata = self._load_metadata()
         self.url = self.metadata.get('url', self.url)
         if 'url' in self.metadata:
             self.url = self.metadata['url']
@@ -242,31 +421,48 @@ class Page(File):
         # ext is always .html, even if md file or self.url is set
         return os.path.splitext(super().dest)[0] + '.html'
 
-    def _load_content(self):
+    @property
+    def content(self):
+        if self._content is None:
+            self._content = self._load_content()
+
+        return self._content
+
+    def _read(self):
         with open(self.path) as f:
-            content = f.read()
+            return f.read()
+
+    def _load_metadata(self):
+        if self.file_type != 'md':
+            return {}
+
+        metadata = self.builder.md_pool.front_matter(self._read())
+
+        if 'date' in metadata:
+            # parsing to a datetime lets us, e.g, sort pages by date at build time
+            post_date = metadata['date']
+            if isinstance(post_date, datetime):
+                pass
+            elif isinstance(post_date, date):
+                metadata['date'] = datetime(post_date.year, post_date.month, post_date.day)
+            elif isinstance(post_date, str):
+                try:
+                    metadata['date'] = datetime.strptime(post_date, '%Y-%m-%d %H:%M:%S')
+                except ValueError:
+                    metadata['date'] = datetime.strptime(post_date, '%Y-%m-%d')
+            else:
+                raise TypeError('Unexpected type for date %s: %s' % (post_date, post_date.__class__))
+
+            # for convenience - reference with {{ page.metadata.human_readable_date }}
+            metadata['human_readable_date'] = metadata['date'].strftime('%-d %b %Y')
+
+        return metadata
+
+    def _load_content(self):
+        content = self._read()
 
         if self.file_type == 'md':
-            content = self.builder.md_converter.convert(content)
-            self.metadata = self.builder.md_converter.front_matter
-
-            if 'date' in self.metadata:
-                # parsing to a datetime lets us, e.g, sort pages by date at build time
-                post_date = self.metadata['date']
-                if isinstance(post_date, datetime):
-                    pass
-                elif isinstance(post_date, date):
-                    self.metadata['date'] = datetime(post_date.year, post_date.month, post_date.day)
-                elif isinstance(post_date, str):
-                    try:
-                        self.metadata['date'] = datetime.strptime(post_date, '%Y-%m-%d %H:%M:%S')
-                    except ValueError:
-                        self.metadata['date'] = datetime.strptime(post_date, '%Y-%m-%d')
-                else:
-                    raise TypeError('Unexpected type for date %s: %s' % (post_date, post_date.__class__))
-
-                # for convenience - reference with {{ page.metadata.human_readable_date }}
-                self.metadata['human_readable_date'] = self.metadata['date'].strftime('%-d %b %Y')
+            content, _ = self.builder.md_pool.convert(content)
 
             # I can't use normal template inheritance because then Jinja syntax won't work inside MD templates
             content = "{%% extends '%s' %%}{%% block post_content %%}%s{%% endblock %%}" % (
@@ -275,6 +471,19 @@ class Page(File):
 
         return content
 
+    def lists_posts(self):
+        """
+        Whether this page lists other pages through site.posts, site.categories or site.tags, either directly or via
+        the templates it extends or includes. Used to find pages that depend on a selection of posts.
+        """
+        source = self._read()
+        templates = self.builder.referenced_templates(source)
+        if self.file_type == 'md':
+            templates.append(self.metadata.get('extends', 'base.html'))
+
+        return bool(self.builder.listing_pattern.search(source)) or \
+            any(self.builder.template_lists_posts(t) for t in templates)
+
     def build(self):
         logger.info('Building %s' % self)
         os.makedirs(os.path.dirname(self.dest), exist_ok=True)
@@ -282,8 +491,6 @@ class Page(File):
         with open(self.dest, 'w') as fh:
             fh.write(template.render(site=self.builder.site_info, page=self, post_content=self.content))
 
-        self.builder.md_converter.reset()
-
     def should_build(self):
         if self.unpublished():
             return False
@@ -299,7 +506,22 @@ def main():
     a.add_argument('-r', '--root', default='.', help='Project root')
     a.add_argument('-b', '--build_dir', default='build', help='Build the site here, or run a dev server here with -s')
     a.add_argument('-f', '--force', nargs='*', help='Force rebuild specified pages, or all')
+    a.add_argument('-o', '--only', nargs='+', metavar='SELECTOR',
+                   help='Only build files matching these globs, category:<name> or tag:<name>, and pages that depend '
+                        'on them')
+    a.add_argument('--shard', type=manifests.parse_shard,
+                   help='Only build shard i of N, given as i/N, and write a manifest of its outputs')
+    a.add_argument('--merge', nargs='+', metavar='SHARD_DIR',
+                   help='Merge the build dirs from a sharded build into the build dir')
+    a.add_argument('--clean', action='store_true', help='Remove orphaned files from the build dir')
+    a.add_argument('--delta', metavar='FILE',
+                   help='Write the outputs added, modified and removed since the last build to this file as json')
+    a.add_argument('-c', '--check', action='store_true',
+                   help='Check the built site for internal links and assets that don\'t exist')
+    a.add_argument('-j', '--jobs', type=int, help='Number of worker processes to use for --check')
     a.add_argument('-s', '--server', action='store_true', help='Set up a dev server for testing')
+    a.add_argument('-a', '--async_server', action='store_true',
+                   help='With -s, use the asyncio dev server, with keep-alive and range requests')
     a.add_argument('-l', '--log_level', default='info', help='Set log level. Can be given in lower case.')
     a.add_argument('-v', '--version', action='store_true', help='Show version')
     args = a.parse_args()
@@ -317,11 +539,35 @@ def main():
         sys.exit(0)
     elif args.server:
         os.chdir(args.build_dir)
-        dev_server.DevServer.run()
+        if args.async_server:
+            dev_server.AsyncDevServer.run()
+        else:
+            dev_server.DevServer.run()
+    elif args.check:
+        os.chdir(args.root)
+
+        builder = Pykyller(args.build_dir)
+        builder.discover_pages()
+        builder.process()
+
+        dangling = link_checker.LinkChecker(builder, args.jobs).check()
+        for page_url, references in dangling.items():
+            for r in references:
+                logger.error('Dangling reference in %s: %s' % (page_url, r))
+
+        nrefs = sum(len(v) for v in dangling.values())
+        logger.info('Found %i dangling references in %i pages' % (nrefs, len(dangling)))
+        sys.exit(1 if dangling else 0)
+    elif args.merge:
+        os.chdir(args.root)
+        manifests.merge_shards(args.build_dir, args.merge, clean=args.clean, delta_file=args.delta)
     else:
         os.chdir(args.root)
 
-        builder = Pykyller(args.build_dir, force_build=args.force)
+        builder = Pykyller(
+            args.build_dir, force_build=args.force, shard=args.shard, clean=args.clean, delta_file=args.delta,
+            only=args.only
+        )
 
         builder.discover_pages()
         builder.process()
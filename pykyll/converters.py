@@ -0,0 +1,64 @@
+import os
+import queue
+import markdown
+from contextlib import contextmanager
+from pykyll import preprocessors
+
+
+class MarkdownPool:
+    """
+    Pool of Markdown converters. Markdown instances hold state between documents, e.g. front_matter from
+    FrontmatterPreprocessor, so each conversion borrows an instance of its own and resets it before giving it back.
+    Converters are created as needed, and up to `size` idle ones are kept for reuse. Safe to use from multiple threads.
+    """
+
+    def __init__(self, size=None):
+        self.size = size or os.cpu_count() or 1
+        self._idle = queue.LifoQueue(maxsize=self.size)
+
+    @staticmethod
+    def new_converter():
+        # extensions keep a reference to their Markdown instance, so each converter needs its own
+        return markdown.Markdown(
+            extensions=[
+                'markdown.extensions.fenced_code',
+                'markdown.extensions.tables',
+                preprocessors.FrontMatterExtension(),
+                preprocessors.CodeBlockExtension()
+            ]
+        )
+
+    @contextmanager
+    def converter(self):
+        try:
+            md = self._idle.get_nowait()
+        except queue.Empty:
+            md = self.new_converter()
+
+        try:
+            yield md
+        finally:
+            md.reset()
+            try:
+                self._idle.put_nowait(md)
+            except queue.Full:
+                pass
+
+    def front_matter(self, text):
+        """
+        Read a document's front matter without rendering it. Whitespace is normalised first, e.g. expanding tabs, as it
+        would be in convert().
+        """
+        with self.converter() as md:
+            lines = md.preprocessors['normalize_whitespace'].run(text.split('\n'))
+
+        return preprocessors.FrontmatterPreprocessor.split_front_matter(lines)
+
+    def convert(self, text):
+        """
+        Convert a Markdown document.
+        :return: The rendered HTML and the document's front matter
+        """
+        with self.converter() as md:
+            html = md.convert(text)
+            return html, md.front_matter
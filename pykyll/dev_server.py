@@ -1,7 +1,24 @@
 import os
+import re
+import sys
+import asyncio
+import posixpath
+import mimetypes
 import http.server
 import urllib.parse
 from http import HTTPStatus
+from email.utils import formatdate
+
+
+def alias_path(path):
+    """
+    Apply Jekyll/GitHub-style aliasing to a translated filesystem path. Files are served normally, and a missing
+    file is looked up with an implicit .html suffix. Anything else, e.g. a directory, is returned unchanged.
+    """
+    if not os.path.isfile(path) and not path.endswith('.html') and os.path.isfile(path + '.html'):
+        return path + '.html'
+
+    return path
 
 
 class DevServer(http.server.SimpleHTTPRequestHandler):
@@ -22,15 +39,11 @@ class DevServer(http.server.SimpleHTTPRequestHandler):
         path = self.translate_path(self.path)
         f = None
 
-        # Next few lines are the important bit. Handle file requests normally, and try looking for implicit .html
+        # Next line is the important bit. Handle file requests normally, and try looking for implicit .html
         # suffixes. It's buried in the middle of the function, so I have to include the entire thing.
-        if os.path.isfile(path):
-            pass
+        path = alias_path(path)
 
-        elif not path.endswith('.html') and os.path.isfile(path + '.html'):
-            path += '.html'
-
-        elif os.path.isdir(path):
+        if os.path.isdir(path):
             # The rest of the function from here is as it appears in the stdlib.
 
             parts = urllib.parse.urlsplit(self.path)
@@ -68,3 +81,228 @@ class DevServer(http.server.SimpleHTTPRequestHandler):
         except:
             f.close()
             raise
+
+
+class AsyncDevServer:
+    """
+    asyncio-based alternative to DevServer for previews with lots of parallel asset requests, and for load tests.
+    Serves with the same URL aliasing as DevServer, and supports HTTP/1.1 keep-alive, single byte range requests and
+    sendfile for response bodies. Only GET and HEAD are supported.
+    """
+    server_version = 'Pykyll'
+    keep_alive_timeout = 15  # seconds to wait for the next request on an idle connection
+    max_headers = 100
+    backlog = 1024
+    range_pattern = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+    def __init__(self, directory=None, host=None, port=5000):
+        self.directory = directory or os.getcwd()
+        self.host = host
+        self.port = port
+
+    @classmethod
+    def run(cls, port=5000):
+        """Serve from the current working directory."""
+        server = cls(port=port)
+        try:
+            asyncio.run(server.serve_forever())
+        except KeyboardInterrupt:
+            print('\nKeyboard interrupt received, exiting.')
+            sys.exit(0)
+
+    async def start(self):
+        return await asyncio.start_server(
+            self.handle_connection, self.host, self.port, backlog=self.backlog, reuse_address=True
+        )
+
+    async def serve_forever(self):
+        server = await self.start()
+        host, port = server.sockets[0].getsockname()[:2]
+        print('Serving HTTP on %s port %s (http://%s:%s/) ...' % (host, port, host, port))
+        async with server:
+            await server.serve_forever()
+
+    def translate_path(self, path):
+        """As in SimpleHTTPRequestHandler, but relative to self.directory."""
+        path = path.split('?', 1)[0].split('#', 1)[0]
+        trailing_slash = path.rstrip().endswith('/')
+        path = posixpath.normpath(urllib.parse.unquote(path))
+
+        fs_path = self.directory
+        for word in filter(None, path.split('/')):
+            if os.path.dirname(word) or word in (os.curdir, os.pardir):
+                continue
+            fs_path = os.path.join(fs_path, word)
+
+        if trailing_slash:
+            fs_path += '/'
+        return fs_path
+
+    async def handle_connection(self, reader, writer):
+        try:
+            keep_alive = True
+            while keep_alive:
+                try:
+                    request_line = await asyncio.wait_for(reader.readline(), self.keep_alive_timeout)
+                except asyncio.TimeoutError:
+                    break
+
+                if not request_line:  # client closed the connection
+                    break
+
+                keep_alive = await self.handle_request(request_line, reader, writer)
+
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError):
+            pass  # client went away or sent something unreasonable
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def read_headers(self, reader):
+        headers = {}
+        for _ in range(self.max_headers):
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                return headers
+
+            name, sep, value = line.decode('iso-8859-1').partition(':')
+            if not sep:
+                raise ValueError('Malformed header line: %r' % line)
+            headers[name.strip().lower()] = value.strip()
+
+        raise ValueError('Too many headers')
+
+    async def handle_request(self, request_line, reader, writer):
+        """
+        Respond to a single request. Returns whether the connection can be kept open for another one.
+        """
+        words = request_line.decode('iso-8859-1').split()
+        if len(words) != 3 or not words[2].startswith('HTTP/'):
+            await self.send_error(writer, None, HTTPStatus.BAD_REQUEST, keep_alive=False)
+            return False
+
+        method, target, version = words
+        headers = await self.read_headers(reader)
+
+        connection = headers.get('connection', '').lower()
+        if version == 'HTTP/1.0':
+            keep_alive = connection == 'keep-alive'
+        else:
+            keep_alive = connection != 'close'
+
+        if method not in ('GET', 'HEAD'):
+            # we don't read request bodies, so can't safely carry on with this connection
+            await self.send_error(writer, method, HTTPStatus.NOT_IMPLEMENTED, keep_alive=False)
+            return False
+
+        path = alias_path(self.translate_path(target))
+
+        if os.path.isdir(path):
+            parts = urllib.parse.urlsplit(target)
+            if not parts.path.endswith('/'):
+                location = urllib.parse.urlunsplit((parts[0], parts[1], parts[2] + '/', parts[3], parts[4]))
+                await self.send_response(
+                    writer, HTTPStatus.MOVED_PERMANENTLY, {'Location': location, 'Content-Length': '0'}, keep_alive
+                )
+                return keep_alive
+
+            for index in 'index.html', 'index.htm':
+                index = os.path.join(path, index)
+                if os.path.isfile(index):
+                    path = index
+                    break
+
+        try:
+            f = open(path, 'rb')
+        except OSError:
+            await self.send_error(writer, method, HTTPStatus.NOT_FOUND, keep_alive)
+            return keep_alive
+
+        with f:
+            fs = os.fstat(f.fileno())
+            size = fs.st_size
+            response_headers = {
+                'Content-Type': mimetypes.guess_type(path)[0] or 'application/octet-stream',
+                'Last-Modified': formatdate(fs.st_mtime, usegmt=True),
+                'Accept-Ranges': 'bytes'
+            }
+
+            status = HTTPStatus.OK
+            start, end = 0, size - 1
+            byte_range = self.parse_range(headers.get('range'), size)
+            if byte_range is not None:
+                if not byte_range:
+                    await self.send_error(
+                        writer, method, HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE, keep_alive,
+                        {'Content-Range': 'bytes */%i' % size}
+                    )
+                    return keep_alive
+
+                status = HTTPStatus.PARTIAL_CONTENT
+                start, end = byte_range
+                response_headers['Content-Range'] = 'bytes %i-%i/%i' % (start, end, size)
+
+            count = end - start + 1
+            response_headers['Content-Length'] = str(count)
+            await self.send_response(writer, status, response_headers, keep_alive)
+
+            if method == 'GET' and count:
+                loop = asyncio.get_running_loop()
+                await loop.sendfile(writer.transport, f, start, count)
+
+        return keep_alive
+
+    def parse_range(self, header, size):
+        """
+        Parse a Range header against a file of the given size. Returns None if the whole file should be sent, an
+        empty tuple if the range can't be satisfied, or a tuple of the first and last byte positions to send. Multiple
+        ranges aren't supported, so these get the whole file, as allowed by RFC 7233.
+        """
+        if not header:
+            return None
+
+        match = self.range_pattern.match(header.strip())
+        if not match:
+            return None
+
+        first, last = match.groups()
+        if not first and not last:
+            return None
+
+        if not first:  # suffix range, e.g. bytes=-500 for the last 500 bytes
+            length = int(last)
+            if not length or not size:
+                return ()
+            return max(size - length, 0), size - 1
+
+        first = int(first)
+        last = int(last) if last else size - 1
+        if first > last or first >= size:
+            return ()
+        return first, min(last, size - 1)
+
+    async def send_response(self, writer, status, headers, keep_alive):
+        lines = [
+            'HTTP/1.1 %i %s' % (status, status.phrase),
+            'Server: %s' % self.server_version,
+            'Date: %s' % formatdate(usegmt=True),
+            'Connection: %s' % ('keep-alive' if keep_alive else 'close')
+        ]
+        lines.extend('%s: %s' % (k, v) for k, v in headers.items())
+        writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('iso-8859-1'))
+        await writer.drain()
+
+    async def send_error(self, writer, method, status, keep_alive, headers=None):
+        """
+        Send an error response with a short plain text body. As in BaseHTTPRequestHandler.send_error, the body is left
+        out for HEAD requests, otherwise it would be read as the start of the next response on the connection.
+        """
+        body = ('%i %s\n' % (status, status.phrase)).encode()
+        headers = dict(headers or {}, **{'Content-Type': 'text/plain', 'Content-Length': str(len(body))})
+        await self.send_response(writer, status, headers, keep_alive)
+        if method != 'HEAD':
+            writer.write(body)
+            await writer.drain()
@@ -0,0 +1,163 @@
+import os
+import json
+import logging
+import posixpath
+import urllib.parse
+from html.parser import HTMLParser
+from concurrent.futures import ProcessPoolExecutor
+
+logger = logging.getLogger('pykyll')
+
+
+class ReferenceParser(HTMLParser):
+    """Collect the values of all href and src attributes in an HTML document."""
+    attrs = ('href', 'src')
+
+    def __init__(self):
+        super().__init__()
+        self.references = []
+
+    def handle_starttag(self, tag, attrs):
+        for k, v in attrs:
+            if k in self.attrs and v:
+                self.references.append(v.strip())
+
+    handle_startendtag = handle_starttag
+
+
+def find_references(path):
+    """Parse an HTML file and return all of its href/src values. Top-level so that it can run in worker processes."""
+    parser = ReferenceParser()
+    with open(path, encoding='utf-8', errors='replace') as f:
+        parser.feed(f.read())
+
+    parser.close()
+    return parser.references
+
+
+def resolve(reference, page_url):
+    """
+    Resolve a reference from a page into an absolute site URL without query or fragment. Returns None for external
+    references (anything with a scheme or host, e.g. https://, mailto:, data:), and for references to the page itself.
+    """
+    parts = urllib.parse.urlsplit(reference)
+    if parts.scheme or parts.netloc or not parts.path:
+        return None
+
+    url = urllib.parse.unquote(urllib.parse.urljoin(page_url, parts.path))
+    resolved = posixpath.normpath(url)
+    if url.endswith('/') and resolved != '/':
+        resolved += '/'
+    return resolved
+
+
+class LinkChecker:
+    """
+    Check all internal references in the built site's HTML against the URLs known from the builder's tree. Pages are
+    parsed in parallel, and their references are cached by output file mtime and size, so only pages that changed
+    since the last check are parsed again. Resolution against the known URLs is always redone, since a page that
+    hasn't changed can still be broken by something it links to being removed.
+    """
+    cache_file = '.pykyll_check_cache.json'
+    min_parallel_pages = 20  # below this, it's not worth starting worker processes
+
+    def __init__(self, builder, jobs=None):
+        self.builder = builder
+        self.jobs = jobs
+
+    def known_urls(self):
+        """
+        All URLs that can be served for the outputs in the tree. These come from File.url/Page.url via File.dest, so
+        include url front matter overrides and dated post URLs. HTML files can also be requested without the .html
+        suffix, and index.html files by their directory, as served by DevServer.
+        """
+        urls = set()
+        for path in self.builder.outputs():
+            url = '/' + path
+            urls.add(url)
+
+            if url.endswith('.html'):
+                urls.add(url[:-len('.html')])
+
+            if posixpath.basename(url) == 'index.html':
+                dir_url = posixpath.dirname(url)
+                urls.add(dir_url)
+                urls.add(dir_url.rstrip('/') + '/')
+
+        return urls
+
+    def _load_cache(self):
+        if not os.path.isfile(self.cache_file):
+            return {}
+
+        with open(self.cache_file) as f:
+            cache = json.load(f)
+
+        return cache.get(os.path.abspath(self.builder.build_dir), {})
+
+    def _write_cache(self, pages):
+        cache = {}
+        if os.path.isfile(self.cache_file):
+            with open(self.cache_file) as f:
+                cache = json.load(f)
+
+        cache[os.path.abspath(self.builder.build_dir)] = pages
+        with open(self.cache_file, 'w') as f:
+            json.dump(cache, f)
+
+    def scan(self):
+        """
+        Find the references in all built HTML pages, re-parsing only those that changed since the last scan.
+        :return: Output paths mapped to the references in them
+        """
+        cache = self._load_cache()
+        pages = {}
+        stale = []
+
+        for path in self.builder.outputs():
+            if not path.endswith('.html'):
+                continue
+
+            dest = os.path.join(self.builder.build_dir, path)
+            try:
+                stat = os.stat(dest)
+            except FileNotFoundError:
+                logger.warning('%s has not been built, skipping' % path)
+                continue
+
+            cached = cache.get(path)
+            if cached and cached['mtime_ns'] == stat.st_mtime_ns and cached['size'] == stat.st_size:
+                pages[path] = cached
+            else:
+                pages[path] = {'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size}
+                stale.append(path)
+
+        logger.info('Scanning %i of %i pages' % (len(stale), len(pages)))
+        dests = [os.path.join(self.builder.build_dir, path) for path in stale]
+        if len(stale) < self.min_parallel_pages or self.jobs == 1:
+            results = map(find_references, dests)
+        else:
+            with ProcessPoolExecutor(self.jobs) as executor:
+                results = list(executor.map(find_references, dests, chunksize=16))
+
+        for path, references in zip(stale, results):
+            pages[path]['references'] = references
+
+        self._write_cache(pages)
+        return {path: page['references'] for path, page in pages.items()}
+
+    def check(self):
+        """
+        :return: URLs of pages with dangling references, mapped to the references that couldn't be resolved
+        """
+        known_urls = self.known_urls()
+        dangling = {}
+
+        for path, references in sorted(self.scan().items()):
+            page_url = '/' + path
+            for r in references:
+                url = resolve(r, page_url)
+                if url is not None and url not in known_urls:
+                    dangling.setdefault(page_url, []).append(r)
+
+        return dangling
@@ -0,0 +1,218 @@
+import os
+import json
+import hashlib
+import argparse
+import logging
+from shutil import copy2
+
+logger = logging.getLogger('pykyll')
+
+manifest_name = '.pykyll_manifest.json'
+
+
+class ManifestError(Exception):
+    pass
+
+
+def parse_shard(arg):
+    """
+    Parse a shard spec of the form 'i/N', where i is 1-based, e.g. '2/4' -> (2, 4). Can be used as an argparse type.
+    """
+    try:
+        index, num_shards = (int(x) for x in arg.split('/'))
+    except ValueError:
+        raise argparse.ArgumentTypeError('Invalid shard spec %r - should be of the form i/N' % arg)
+
+    if not 0 < index <= num_shards:
+        raise argparse.ArgumentTypeError('Invalid shard spec %r - should have 1 <= i <= N' % arg)
+
+    return index, num_shards
+
+
+def manifest_path(build_dir):
+    return os.path.join(build_dir, manifest_name)
+
+
+def read_manifest(build_dir):
+    with open(manifest_path(build_dir)) as f:
+        return json.load(f)
+
+
+def write_manifest(build_dir, outputs, shard=None):
+    """
+    Write a manifest of the files in a build dir.
+    :param str build_dir:
+    :param dict outputs: Output paths relative to build_dir, mapped to the source, sha256, size and mtime_ns of each
+    :param tuple shard: (index, num_shards) if this is a sharded build
+    """
+    os.makedirs(build_dir, exist_ok=True)
+    with open(manifest_path(build_dir), 'w') as f:
+        json.dump({'shard': list(shard) if shard else None, 'outputs': outputs}, f, indent=2, sort_keys=True)
+
+
+def file_hash(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+
+    return h.hexdigest()
+
+
+def describe_outputs(build_dir, sources, known=None):
+    """
+    Stat and hash the outputs in a build dir. Hashing is skipped for any output whose size and mtime match an entry in
+    known, e.g. from the previous manifest, so incremental builds only hash the files they actually wrote.
+    :param str build_dir:
+    :param dict sources: Output paths relative to build_dir, mapped to the source paths they were built from
+    :param dict known: Existing manifest entries to reuse hashes from
+    """
+    known = known or {}
+    outputs = {}
+    for path, source in sources.items():
+        dest = os.path.join(build_dir, path)
+        try:
+            stat = os.stat(dest)
+        except FileNotFoundError:
+            logger.warning('Expected output %s does not exist' % dest)
+            continue
+
+        entry = known.get(path)
+        if entry and entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+            sha256 = entry['sha256']
+        else:
+            sha256 = file_hash(dest)
+
+        outputs[path] = {'source': source, 'sha256': sha256, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+    return outputs
+
+
+def find_files(build_dir):
+    """All files in a build dir, relative to it, excluding the manifest."""
+    files = []
+    for path, dirs, filenames in os.walk(build_dir):
+        for f in filenames:
+            rel_path = os.path.relpath(os.path.join(path, f), build_dir).replace(os.path.sep, '/')
+            if rel_path != manifest_name:
+                files.append(rel_path)
+
+    return files
+
+
+def diff(previous, current, on_disk=()):
+    """
+    Compare two sets of manifest outputs.
+    :param dict previous: Outputs from the last manifest written to the build dir
+    :param dict current: Outputs from this build
+    :param on_disk: Files present in the build dir, so that orphaned files not in any manifest are also reported
+    :return: Added and modified paths mapped to their new hashes, and a sorted list of removed paths
+    """
+    delta = {'added': {}, 'modified': {}, 'removed': []}
+    for path, entry in current.items():
+        if path not in previous:
+            delta['added'][path] = entry['sha256']
+        elif previous[path]['sha256'] != entry['sha256']:
+            delta['modified'][path] = entry['sha256']
+
+    delta['removed'] = sorted((set(previous) | set(on_disk)) - set(current))
+    return delta
+
+
+def remove_orphans(build_dir, paths):
+    """Remove files from a build dir, along with any directories this leaves empty."""
+    for path in paths:
+        dest = os.path.join(build_dir, path)
+        if not os.path.isfile(dest):
+            continue
+
+        logger.info('Removing orphaned output %s' % dest)
+        os.remove(dest)
+
+        parent = os.path.dirname(dest)
+        while os.path.abspath(parent) != os.path.abspath(build_dir) and not os.listdir(parent):
+            os.rmdir(parent)
+            parent = os.path.dirname(parent)
+
+
+def update_manifest(build_dir, sources, shard=None, known=None, clean=False, delta_file=None):
+    """
+    Write a new manifest for a build dir and work out what changed since the previous one.
+    :param str build_dir:
+    :param dict sources: Output paths relative to build_dir, mapped to the source paths they were built from
+    :param tuple shard: (index, num_shards) if this is a sharded build
+    :param dict known: Manifest entries to reuse hashes from, in addition to the previous manifest
+    :param bool clean: Remove orphaned files, i.e. anything in the build dir that this build didn't output
+    :param str delta_file: Write the added, modified and removed outputs to this file as json
+    :return: The delta, as from diff()
+    """
+    try:
+        previous = read_manifest(build_dir)['outputs']
+    except FileNotFoundError:
+        previous = {}
+
+    current = describe_outputs(build_dir, sources, dict(previous, **(known or {})))
+    delta = diff(previous, current, find_files(build_dir))
+    logger.info(
+        '%i outputs added, %i modified and %i removed' % tuple(len(delta[k]) for k in ('added', 'modified', 'removed'))
+    )
+
+    if clean:
+        remove_orphans(build_dir, delta['removed'])
+
+    write_manifest(build_dir, current, shard)
+
+    if delta_file:
+        with open(delta_file, 'w') as f:
+            json.dump(delta, f, indent=2, sort_keys=True)
+
+    return delta
+
+
+def merge_shards(build_dir, shard_dirs, clean=False, delta_file=None):
+    """
+    Combine the build dirs from a complete set of sharded builds into one build dir, checking that no output path was
+    produced by more than one shard.
+    """
+    manifests = {}
+    for d in shard_dirs:
+        try:
+            manifest = read_manifest(d)
+        except FileNotFoundError:
+            raise ManifestError('No manifest found in %s' % d)
+
+        if not manifest['shard']:
+            raise ManifestError('%s is not from a sharded build' % d)
+        manifests[d] = manifest
+
+    shards = sorted(tuple(m['shard']) for m in manifests.values())
+    num_shards = shards[0][1] if shards else 0
+    expected = [(i, num_shards) for i in range(1, num_shards + 1)]
+    if shards != expected:
+        raise ManifestError(
+            'Incomplete or inconsistent set of shards: got %s' % ', '.join('%i/%i' % s for s in shards)
+        )
+
+    outputs = {}
+    output_dirs = {}
+    duplicates = []
+    for d, manifest in manifests.items():
+        for path, entry in manifest['outputs'].items():
+            if path in outputs:
+                duplicates.append('%s (from %s and %s)' % (path, output_dirs[path], d))
+            outputs[path] = entry
+            output_dirs[path] = d
+
+    if duplicates:
+        raise ManifestError('Output paths produced more than once: %s' % ', '.join(sorted(duplicates)))
+
+    logger.info('Merging %i outputs from %i shards into %s' % (len(outputs), num_shards, build_dir))
+    for path in sorted(outputs):
+        dest = os.path.join(build_dir, path)
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        copy2(os.path.join(output_dirs[path], path), dest)
+
+    # copy2 preserves mtimes, so the shards' hashes can be reused
+    return update_manifest(
+        build_dir, {k: v['source'] for k, v in outputs.items()}, known=outputs, clean=clean, delta_file=delta_file
+    )
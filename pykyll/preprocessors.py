@@ -25,6 +25,16 @@ class FrontmatterPreprocessor(Preprocessor):
     boundary_line = '---'
 
     def run(self, lines):
+        self.md.front_matter = self.split_front_matter(lines)
+        return lines
+
+    @classmethod
+    def split_front_matter(cls, lines):
+        """
+        Remove the front matter from the start of a list of lines, in place. Can be used without a Markdown instance
+        to read a document's front matter without rendering it.
+        :return: The parsed front matter
+        """
         front_matter = []
         in_front_matter = False
 
@@ -33,21 +43,20 @@ class FrontmatterPreprocessor(Preprocessor):
 
             if in_front_matter:
                 lines.pop(0)
-                if line == self.boundary_line:  # end of front matter
+                if line == cls.boundary_line:  # end of front matter
                     break
                 else:
                     front_matter.append(line)
 
             else:
-                if line == self.boundary_line:  # start of front matter
+                if line == cls.boundary_line:  # start of front matter
                     lines.pop(0)
                     in_front_matter = True
                 else:  # not '---' and not encountered any front matter - assume none in file
                     break
 
         data = '\n'.join(front_matter)
-        self.md.front_matter = yaml.safe_load(data) or {}
-        return lines
+        return yaml.safe_load(data) or {}
 
 
 class FrontMatterExtension(Extension):
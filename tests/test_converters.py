@@ -0,0 +1,44 @@
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from pykyll import converters
+
+
+class TestMarkdownPool(unittest.TestCase):
+    def setUp(self):
+        self.pool = converters.MarkdownPool(size=2)
+
+    def test_convert(self):
+        html, front_matter = self.pool.convert('---\ntitle: A title\n---\n\nSome *text*')
+        self.assertEqual(html, '<p>Some <em>text</em></p>')
+        self.assertDictEqual(front_matter, {'title': 'A title'})
+
+        # no front matter leaking from the previous document
+        html, front_matter = self.pool.convert('More text')
+        self.assertEqual(html, '<p>More text</p>')
+        self.assertDictEqual(front_matter, {})
+
+    def test_front_matter(self):
+        text = '---\ntitle: A title\nsome:\n\t- tab\n\t- indented\n---\n\nSome *text*'
+        self.assertDictEqual(self.pool.front_matter(text), {'title': 'A title', 'some': ['tab', 'indented']})
+        self.assertDictEqual(self.pool.front_matter(text), self.pool.convert(text)[1])
+        self.assertDictEqual(self.pool.front_matter('Some *text*'), {})
+
+    def test_converter_reuse(self):
+        with self.pool.converter() as md:
+            md.convert('---\ntitle: A title\n---\n')
+
+        with self.pool.converter() as md2, self.pool.converter() as md3:
+            self.assertIs(md2, md)  # returned to the pool and reset
+            self.assertDictEqual(md2.front_matter, {})
+            self.assertIsNot(md3, md2)  # pool empty, so a new one is created
+
+    def test_concurrent_convert(self):
+        docs = ['---\nindex: %i\n---\n\nDocument %i' % (i, i) for i in range(50)]
+        with ThreadPoolExecutor(8) as executor:
+            results = list(executor.map(self.pool.convert, docs))
+
+        for i, (html, front_matter) in enumerate(results):
+            self.assertEqual(html, '<p>Document %i</p>' % i)
+            self.assertDictEqual(front_matter, {'index': i})
+
+        self.assertLessEqual(self.pool._idle.qsize(), 2)
@@ -0,0 +1,114 @@
+import os
+import asyncio
+import unittest
+from unittest.mock import ANY
+from tempfile import TemporaryDirectory
+from pykyll import dev_server
+
+
+class TestAliasPath(unittest.TestCase):
+    def test_alias_path(self):
+        with TemporaryDirectory() as d:
+            os.makedirs(os.path.join(d, 'this'))
+            for f in ('this.html', 'that.txt', os.path.join('this', 'index.html')):
+                open(os.path.join(d, f), 'w').close()
+
+            self.assertEqual(dev_server.alias_path(os.path.join(d, 'this.html')), os.path.join(d, 'this.html'))
+            self.assertEqual(dev_server.alias_path(os.path.join(d, 'this')), os.path.join(d, 'this.html'))
+            self.assertEqual(dev_server.alias_path(os.path.join(d, 'that.txt')), os.path.join(d, 'that.txt'))
+            self.assertEqual(dev_server.alias_path(os.path.join(d, 'other')), os.path.join(d, 'other'))
+
+
+class TestAsyncDevServer(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.tmp_dir = TemporaryDirectory()
+        d = self.tmp_dir.name
+        os.makedirs(os.path.join(d, 'posts'))
+        with open(os.path.join(d, 'this.html'), 'w') as f:
+            f.write('<p>this</p>')
+        with open(os.path.join(d, 'posts', 'index.html'), 'w') as f:
+            f.write('<p>posts</p>')
+
+        self.server = await dev_server.AsyncDevServer(d, '127.0.0.1', 0).start()
+        self.port = self.server.sockets[0].getsockname()[1]
+        self.reader, self.writer = await asyncio.open_connection('127.0.0.1', self.port)
+
+    async def asyncTearDown(self):
+        self.writer.close()
+        await self.writer.wait_closed()
+        self.server.close()
+        await self.server.wait_closed()
+        self.tmp_dir.cleanup()
+
+    async def request(self, path, method='GET', headers=None):
+        lines = ['%s %s HTTP/1.1' % (method, path), 'Host: localhost']
+        lines.extend('%s: %s' % (k, v) for k, v in (headers or {}).items())
+        self.writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode())
+        await self.writer.drain()
+
+        status = int((await self.reader.readline()).split()[1])
+        response_headers = {}
+        while True:
+            line = (await self.reader.readline()).decode().strip()
+            if not line:
+                break
+            k, v = line.split(':', 1)
+            response_headers[k.lower()] = v.strip()
+
+        body = b''
+        if method != 'HEAD':
+            body = await self.reader.readexactly(int(response_headers['content-length']))
+        return status, response_headers, body
+
+    async def test_keep_alive_and_aliasing(self):
+        # all on the same connection
+        self.assertEqual(await self.request('/this.html'), (200, ANY, b'<p>this</p>'))
+        self.assertEqual((await self.request('/this'))[2], b'<p>this</p>')
+        self.assertEqual((await self.request('/posts/'))[2], b'<p>posts</p>')
+
+        status, headers, body = await self.request('/posts')
+        self.assertEqual(status, 301)
+        self.assertEqual(headers['location'], '/posts/')
+
+        status, headers, body = await self.request('/this', method='HEAD')
+        self.assertEqual(status, 200)
+        self.assertEqual(headers['content-length'], '11')
+        self.assertEqual(headers['content-type'], 'text/html')
+
+        self.assertEqual((await self.request('/non_existent'))[0], 404)
+        self.assertEqual((await self.request('/this'))[0], 200)
+
+    async def test_range_requests(self):
+        status, headers, body = await self.request('/this', headers={'Range': 'bytes=3-6'})
+        self.assertEqual(status, 206)
+        self.assertEqual(headers['content-range'], 'bytes 3-6/11')
+        self.assertEqual(body, b'this')
+
+        self.assertEqual((await self.request('/this', headers={'Range': 'bytes=-4'}))[2], b'</p>')
+        self.assertEqual((await self.request('/this', headers={'Range': 'bytes=7-'}))[2], b'</p>')
+
+        status, headers, body = await self.request('/this', headers={'Range': 'bytes=20-'})
+        self.assertEqual(status, 416)
+        self.assertEqual(headers['content-range'], 'bytes */11')
+
+    async def test_head_errors(self):
+        # no error body for HEAD, so the next response on the connection is read correctly
+        status, headers, body = await self.request('/non_existent', method='HEAD')
+        self.assertEqual(status, 404)
+        self.assertEqual(headers['content-length'], '14')
+        self.assertEqual(await self.request('/this'), (200, ANY, b'<p>this</p>'))
+
+        status, headers, body = await self.request('/this', method='HEAD', headers={'Range': 'bytes=20-'})
+        self.assertEqual(status, 416)
+        self.assertEqual(await self.request('/this'), (200, ANY, b'<p>this</p>'))
+
+    def test_parse_range(self):
+        s = dev_server.AsyncDevServer()
+        self.assertIsNone(s.parse_range(None, 10))
+        self.assertIsNone(s.parse_range('bytes=0-1,3-4', 10))
+        self.assertEqual(s.parse_range('bytes=2-', 10), (2, 9))
+        self.assertEqual(s.parse_range('bytes=2-100', 10), (2, 9))
+        self.assertEqual(s.parse_range('bytes=-3', 10), (7, 9))
+        self.assertEqual(s.parse_range('bytes=-30', 10), (0, 9))
+        self.assertEqual(s.parse_range('bytes=5-2', 10), ())
+        self.assertEqual(s.parse_range('bytes=10-', 10), ())
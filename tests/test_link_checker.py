@@ -0,0 +1,84 @@
+import os
+import unittest
+from unittest.mock import Mock, patch
+from tempfile import TemporaryDirectory
+from pykyll import link_checker
+
+
+class TestLinkChecker(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = TemporaryDirectory()
+        self.original_dir = os.getcwd()
+        os.chdir(self.tmp_dir.name)
+
+        self.pages = {
+            'index.html': '<a href="/posts/">Posts</a><a href="about">About</a><img src="/img/missing.png"/>',
+            'about.html': '<a href="index.html#top">Home</a><a href="https://example.com">External</a>',
+            'posts/index.html': '<a href="../programming/2020/04/04/post.html">Post</a><a href="#top">Top</a>',
+            'programming/2020/04/04/post.html': '<link href="/css/style.css"><a href="/posts">All posts</a>'
+                                                '<a href="mailto:someone@example.com">Mail</a><a href="../05/">?</a>'
+        }
+        outputs = dict.fromkeys(list(self.pages) + ['css/style.css'])
+        for path, content in self.pages.items():
+            os.makedirs(os.path.join('build', os.path.dirname(path)), exist_ok=True)
+            with open(os.path.join('build', path), 'w') as f:
+                f.write(content)
+
+        self.checker = link_checker.LinkChecker(Mock(build_dir='build', outputs=Mock(return_value=outputs)), jobs=1)
+
+    def tearDown(self):
+        os.chdir(self.original_dir)
+        self.tmp_dir.cleanup()
+
+    def test_find_references(self):
+        self.assertListEqual(
+            link_checker.find_references('build/index.html'),
+            ['/posts/', 'about', '/img/missing.png']
+        )
+
+    def test_resolve(self):
+        self.assertEqual(link_checker.resolve('that.html', '/this/other.html'), '/this/that.html')
+        self.assertEqual(link_checker.resolve('../that/?q=1#top', '/this/other.html'), '/that/')
+        self.assertEqual(link_checker.resolve('/this%20that', '/index.html'), '/this that')
+        self.assertEqual(link_checker.resolve('..', '/index.html'), '/')
+        self.assertIsNone(link_checker.resolve('#top', '/index.html'))
+        self.assertIsNone(link_checker.resolve('https://example.com/this', '/index.html'))
+        self.assertIsNone(link_checker.resolve('//example.com/this', '/index.html'))
+        self.assertIsNone(link_checker.resolve('mailto:someone@example.com', '/index.html'))
+
+    def test_known_urls(self):
+        self.assertSetEqual(
+            self.checker.known_urls(),
+            {
+                '/', '/index', '/index.html', '/about', '/about.html', '/posts', '/posts/', '/posts/index',
+                '/posts/index.html', '/programming/2020/04/04/post', '/programming/2020/04/04/post.html',
+                '/css/style.css'
+            }
+        )
+
+    def test_check(self):
+        exp = {
+            '/index.html': ['/img/missing.png'],
+            '/programming/2020/04/04/post.html': ['../05/']
+        }
+        self.assertDictEqual(self.checker.check(), exp)
+
+        # nothing changed, so nothing gets re-parsed
+        with patch.object(link_checker, 'find_references') as patched_find_references:
+            self.assertDictEqual(self.checker.check(), exp)
+            patched_find_references.assert_not_called()
+
+        with open('build/about.html', 'w') as f:
+            f.write('<a href="/nope.html">Broken</a>')
+
+        with patch.object(link_checker, 'find_references', wraps=link_checker.find_references) as patched:
+            self.assertDictEqual(self.checker.check(), dict(exp, **{'/about.html': ['/nope.html']}))
+            patched.assert_called_once_with(os.path.join('build', 'about.html'))
+
+    def test_check_parallel(self):
+        self.checker.jobs = 2
+        self.checker.min_parallel_pages = 0
+        self.assertDictEqual(
+            self.checker.check(),
+            {'/index.html': ['/img/missing.png'], '/programming/2020/04/04/post.html': ['../05/']}
+        )
@@ -0,0 +1,126 @@
+import os
+import json
+import hashlib
+import argparse
+import unittest
+from unittest.mock import patch
+from tempfile import TemporaryDirectory
+from pykyll import manifests
+
+
+class TestManifests(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = TemporaryDirectory()
+        self.root = self.tmp_dir.name
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    @staticmethod
+    def _write_outputs(build_dir, outputs, content=None):
+        for path in outputs:
+            os.makedirs(os.path.dirname(os.path.join(build_dir, path)), exist_ok=True)
+            with open(os.path.join(build_dir, path), 'w') as f:
+                f.write(content or path)
+
+    def _fake_shard(self, name, shard, outputs):
+        build_dir = os.path.join(self.root, name)
+        self._write_outputs(build_dir, outputs)
+        manifests.update_manifest(build_dir, outputs, shard)
+        return build_dir
+
+    @staticmethod
+    def _hash(content):
+        return hashlib.sha256(content.encode()).hexdigest()
+
+    def test_parse_shard(self):
+        self.assertEqual(manifests.parse_shard('2/4'), (2, 4))
+        for arg in ('0/4', '5/4', '2', 'this/that'):
+            with self.assertRaises(argparse.ArgumentTypeError):
+                manifests.parse_shard(arg)
+
+    def test_merge_shards(self):
+        shard_1 = self._fake_shard('shard_1', (1, 2), {'this.html': 'this.md', 'css/style.css': 'css/style.css'})
+        shard_2 = self._fake_shard('shard_2', (2, 2), {'posts/that.html': 'posts/that.md'})
+        build_dir = os.path.join(self.root, 'build')
+
+        manifests.merge_shards(build_dir, [shard_1, shard_2])
+        for path in ('this.html', 'css/style.css', 'posts/that.html'):
+            with open(os.path.join(build_dir, path)) as f:
+                self.assertEqual(f.read(), path)
+
+        manifest = manifests.read_manifest(build_dir)
+        self.assertIsNone(manifest['shard'])
+        self.assertDictEqual(
+            {k: (v['source'], v['sha256']) for k, v in manifest['outputs'].items()},
+            {
+                'this.html': ('this.md', self._hash('this.html')),
+                'css/style.css': ('css/style.css', self._hash('css/style.css')),
+                'posts/that.html': ('posts/that.md', self._hash('posts/that.html'))
+            }
+        )
+
+    def test_merge_shards_errors(self):
+        shard_1 = self._fake_shard('shard_1', (1, 2), {'this.html': 'this.md'})
+        shard_2 = self._fake_shard('shard_2', (2, 2), {'this.html': 'this.html'})
+        other_shard_2 = self._fake_shard('other_shard_2', (2, 3), {'that.html': 'that.md'})
+        build_dir = os.path.join(self.root, 'build')
+
+        with self.assertRaisesRegex(manifests.ManifestError, r'this\.html \(from .*shard_1 and .*shard_2\)'):
+            manifests.merge_shards(build_dir, [shard_1, shard_2])
+
+        with self.assertRaisesRegex(manifests.ManifestError, 'Incomplete or inconsistent set of shards'):
+            manifests.merge_shards(build_dir, [shard_1])
+
+        with self.assertRaisesRegex(manifests.ManifestError, 'Incomplete or inconsistent set of shards'):
+            manifests.merge_shards(build_dir, [shard_1, other_shard_2])
+
+        self.assertFalse(os.path.exists(build_dir))
+
+    def test_update_manifest(self):
+        build_dir = os.path.join(self.root, 'build')
+        delta_file = os.path.join(self.root, 'delta.json')
+        outputs = {'this.html': 'this.md', 'that.html': 'that.md', 'posts/other.html': 'posts/other.md'}
+        self._write_outputs(build_dir, outputs)
+
+        delta = manifests.update_manifest(build_dir, outputs, delta_file=delta_file)
+        self.assertDictEqual(
+            delta,
+            {'added': {k: self._hash(k) for k in outputs}, 'modified': {}, 'removed': []}
+        )
+        with open(delta_file) as f:
+            self.assertDictEqual(json.load(f), delta)
+
+        # 'that' changed, 'other' removed, 'another' added, and an orphan with no manifest entry lying around
+        outputs = {'this.html': 'this.md', 'that.html': 'that.md', 'another.html': 'another.md'}
+        self._write_outputs(build_dir, ['that.html'], 'modified')
+        self._write_outputs(build_dir, ['another.html', 'old/orphan.html'])
+
+        with patch.object(manifests, 'file_hash', wraps=manifests.file_hash) as patched_hash:
+            delta = manifests.update_manifest(build_dir, outputs)
+            # this.html is unchanged, so it isn't hashed again
+            self.assertListEqual(
+                sorted(c[0][0] for c in patched_hash.call_args_list),
+                [os.path.join(build_dir, 'another.html'), os.path.join(build_dir, 'that.html')]
+            )
+
+        self.assertDictEqual(
+            delta,
+            {
+                'added': {'another.html': self._hash('another.html')},
+                'modified': {'that.html': self._hash('modified')},
+                'removed': ['old/orphan.html', 'posts/other.html']
+            }
+        )
+        self.assertTrue(os.path.isfile(os.path.join(build_dir, 'old', 'orphan.html')))
+        self.assertListEqual(sorted(manifests.read_manifest(build_dir)['outputs']), sorted(outputs))
+
+        # orphans are still reported until they're cleaned up
+        delta = manifests.update_manifest(build_dir, outputs, clean=True)
+        self.assertDictEqual(delta, {'added': {}, 'modified': {}, 'removed': ['old/orphan.html', 'posts/other.html']})
+        self.assertFalse(os.path.exists(os.path.join(build_dir, 'old')))
+        self.assertFalse(os.path.exists(os.path.join(build_dir, 'posts')))
+        self.assertListEqual(sorted(manifests.find_files(build_dir)), sorted(outputs))
+
+        delta = manifests.update_manifest(build_dir, outputs)
+        self.assertDictEqual(delta, {'added': {}, 'modified': {}, 'removed': []})
@@ -1,6 +1,8 @@
+import os
 import unittest
-from unittest.mock import Mock, MagicMock, patch
+from unittest.mock import Mock, patch
 from datetime import datetime
+from tempfile import TemporaryDirectory
 import pykyll
 
 
@@ -38,8 +40,9 @@ class TestPykyller(unittest.TestCase):
             }
         )
 
+    @patch.object(pykyll.manifests, 'update_manifest')
     @patch.object(pykyll.File, 'build')
-    def test_build(self, patched_file_build):
+    def test_build(self, patched_file_build, patched_update_manifest):
         self.builder.tree = {
             'top_level.txt': pykyll.File('top_level.txt', self.builder),
             'this': {
@@ -50,6 +53,175 @@ class TestPykyller(unittest.TestCase):
         }
         self.builder.build()
         self.assertEqual(patched_file_build.call_count, 2)
+        patched_update_manifest.assert_called_with(
+            'build',
+            {'top_level.txt': 'top_level.txt', 'this/that/other.txt': 'this/that/other.txt'},
+            shard=None,
+            clean=False,
+            delta_file=None
+        )
+
+    def test_in_shard(self):
+        files = [pykyll.File('file_%i.txt' % i, self.builder) for i in range(20)]
+        self.assertTrue(all(self.builder.in_shard(f) for f in files))
+
+        shards = []
+        for i in range(1, 4):
+            self.builder.shard = (i, 3)
+            shards.append({f.path for f in files if self.builder.in_shard(f)})
+
+        # every file in exactly one shard
+        self.assertEqual(sum(len(s) for s in shards), 20)
+        self.assertSetEqual(set.union(*shards), {f.path for f in files})
+
+    @patch.object(pykyll.Page, '_load_metadata', return_value={})
+    def test_outputs(self, patched_load_metadata):
+        unpublished = pykyll.Page('this/unpublished.md', self.builder)
+        unpublished.metadata = {'publish': False}
+        self.builder.tree = {
+            'top_level.txt': pykyll.File('top_level.txt', self.builder),
+            'this': {
+                'that.md': pykyll.Page('this/that.md', self.builder),
+                'unpublished.md': unpublished
+            }
+        }
+        self.assertDictEqual(
+            self.builder.outputs(),
+            {'top_level.txt': self.builder.tree['top_level.txt'], 'this/that.html': self.builder.tree['this']['that.md']}
+        )
+
+        self.builder.shard = (1, 2)
+        with patch.object(pykyll.Pykyller, 'in_shard', new=lambda builder, f: f.path.endswith('.txt')):
+            self.assertListEqual(list(self.builder.outputs()), ['top_level.txt'])
+
+    @patch.object(pykyll.Page, '_load_metadata', return_value={})
+    def test_outputs_duplicates(self, patched_load_metadata):
+        self.builder.tree = {
+            'about.md': pykyll.Page('about.md', self.builder),
+            'about.html': pykyll.Page('about.html', self.builder),
+            'other.txt': pykyll.File('other.txt', self.builder)
+        }
+        with self.assertLogs('pykyll', 'WARNING'):
+            self.assertDictEqual(
+                self.builder.outputs(),
+                {'about.html': self.builder.tree['about.html'], 'other.txt': self.builder.tree['other.txt']}
+            )
+
+        # both colliding files in the same shard
+        self.builder.shard = (1, 2)
+        with patch.object(pykyll.Pykyller, 'in_shard', new=lambda builder, f: f.path.startswith('about')), \
+                patch.object(pykyll.Page, 'build') as patched_build:
+            with self.assertRaisesRegex(pykyll.manifests.ManifestError, r'about\.html \(from about\.md, about\.html\)'):
+                self.builder.outputs()
+
+            with self.assertRaises(pykyll.manifests.ManifestError):
+                self.builder.build()
+            patched_build.assert_not_called()
+
+
+class TestSelection(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = TemporaryDirectory()
+        self.original_dir = os.getcwd()
+        os.chdir(self.tmp_dir.name)
+
+        files = {
+            'templates/base.html': '{% block content %}{% endblock %}',
+            'templates/listing.html': "{% extends 'base.html' %}{% block content %}{% include 'post_list.html' %}"
+                                      "{% endblock %}",
+            'templates/post_list.html': '{% for p in site["posts"] %}{{ p.url }}{% endfor %}',
+            'index.html': "{% extends 'listing.html' %}",
+            'tags.md': '{% for t in site.tags %}{{ t }}{% endfor %}',
+            'about.md': 'About',
+            'projects/project.md': '---\ndate: 2020-03-01\ntags: [python]\n---\nA project',
+            'css/style.css': 'body {}'
+        }
+        for i, (category, tags) in enumerate(
+            (('Programming', ['python']), ('Biology', ['genomics']), ('Programming', ['c']), ('Biology', []))
+        ):
+            files['posts/post_%i.md' % i] = '---\ndate: 2020-04-0%i\ncategory: %s\ntags: %s\n---\nPost %i' % (
+                i + 1, category, tags, i
+            )
+
+        for path, content in files.items():
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            with open(path, 'w') as f:
+                f.write(content)
+
+        self.builder = pykyll.Pykyller()
+        self.builder.discover_pages()
+        self.builder.process()
+
+    def tearDown(self):
+        os.chdir(self.original_dir)
+        self.tmp_dir.cleanup()
+
+    def test_lists_posts(self):
+        self.assertTrue(self.builder.tree['index.html'].lists_posts())
+        self.assertTrue(self.builder.tree['tags.md'].lists_posts())
+        self.assertFalse(self.builder.tree['about.md'].lists_posts())
+        self.assertFalse(self.builder.tree['posts']['post_1.md'].lists_posts())
+
+    def test_select(self):
+        self.builder.only = ['css/*']
+        self.assertSetEqual(self.builder.select(), {'css/style.css'})
+
+        # not a post, but listed in site.tags
+        self.builder.only = ['projects/project.md']
+        self.assertSetEqual(self.builder.select(), {'projects/project.md', 'index.html', 'tags.md'})
+
+        self.builder.only = ['about.md', 'tag:c']
+        self.assertSetEqual(
+            self.builder.select(),
+            {'about.md', 'posts/post_2.md', 'posts/post_1.md', 'posts/post_3.md', 'index.html', 'tags.md'}
+        )
+
+        for category in ('Programming', 'programming'):
+            self.builder.only = ['category:' + category]
+            self.assertSetEqual(
+                self.builder.select(),
+                {'posts/post_0.md', 'posts/post_1.md', 'posts/post_2.md', 'posts/post_3.md', 'index.html', 'tags.md'}
+            )
+
+        self.builder.only = ['category:Chemistry', 'non_existent/*']
+        with self.assertLogs('pykyll', 'WARNING') as logs:
+            self.assertSetEqual(self.builder.select(), set())
+        self.assertIn('No files matched category:Chemistry, non_existent/*', logs.output[0])
+
+    def test_select_unpublished(self):
+        with open('posts/post_1.md') as f:
+            content = f.read()
+        with open('posts/post_1.md', 'w') as f:
+            f.write(content.replace('---\n', '---\npublish: False\n', 1))
+
+        builder = pykyll.Pykyller()
+        builder.discover_pages()
+        builder.process()
+        builder.only = ['posts/post_1.md']
+        self.assertSetEqual(
+            builder.select(),
+            {'posts/post_0.md', 'posts/post_1.md', 'posts/post_2.md', 'index.html', 'tags.md'}
+        )
+
+        with patch.object(pykyll.manifests, 'update_manifest'), \
+                patch.object(pykyll.Page, 'build') as patched_build:
+            builder.build()
+
+        # everything except the unpublished post itself
+        self.assertEqual(patched_build.call_count, 4)
+
+    @patch.object(pykyll.manifests, 'update_manifest')
+    def test_build(self, patched_update_manifest):
+        self.builder.only = ['posts/post_0.md']
+        with patch.object(pykyll.converters.MarkdownPool, 'convert', return_value=('', {})) as patched_convert:
+            self.builder.build()
+
+        self.assertListEqual(
+            sorted(os.path.relpath(os.path.join(d, f), 'build') for d, _, fs in os.walk('build') for f in fs),
+            ['biology/2020/04/02/post_1.html', 'index.html', 'programming/2020/04/01/post_0.html', 'tags.html']
+        )
+        # only the selected pages are converted
+        self.assertEqual(patched_convert.call_count, 3)
 
 
 class TestFile(unittest.TestCase):
@@ -100,18 +272,30 @@ class TestFile(unittest.TestCase):
 class TestPage(TestFile):
     def test_fields(self):
         self.builder = pykyll.Pykyller()
-        with patch.object(pykyll.Page, '_load_content', return_value='some content'):
+        with patch.object(pykyll.Page, '_load_metadata', return_value={}):
             md_file = pykyll.Page('this/that.md', self.builder)
             self.assertEqual(md_file.dest, 'build/this/that.html')
 
-    @patch.object(pykyll.Pykyller, 'md_converter', new=Mock(convert=lambda content: content, front_matter={'date': '2020-04-04 12:00:00'}))
+        with patch.object(pykyll.Page, '_load_metadata', return_value={'url': '/that.html'}):
+            md_file = pykyll.Page('this/that.md', self.builder)
+            self.assertEqual(md_file.dest, 'build/that.html')
+
+    @patch.object(pykyll.converters.MarkdownPool, 'convert', new=lambda self, content: ('converted', {}))
     def test_load_content(self):
-        with patch('builtins.open', return_value=MagicMock(__enter__=Mock(return_value=Mock(read=Mock(return_value='some content'))))):
+        source = '---\ndate: 2020-04-04 12:00:00\n---\nsome content'
+        with patch.object(pykyll.Page, '_read', return_value=source) as patched_read:
             html_file = pykyll.Page('this/this.html', self.builder)
             md_file = pykyll.Page('this/that.md', self.builder)
+            self.assertEqual(patched_read.call_count, 1)  # only front matter read so far
+
+            self.assertEqual(html_file.content, source)
+            self.assertEqual(md_file.content, "{% extends 'base.html' %}{% block post_content %}converted{% endblock %}")
+            self.assertEqual(patched_read.call_count, 3)
+
+            md_file.content
+            self.assertEqual(patched_read.call_count, 3)  # content is cached
 
-        self.assertEqual(html_file.content, 'some content')
-        self.assertEqual(md_file.content, "{% extends 'base.html' %}{% block post_content %}some content{% endblock %}")
+        self.assertDictEqual(html_file.metadata, {})
         self.assertDictEqual(
             md_file.metadata,
             {'date': datetime(2020, 4, 4, 12), 'human_readable_date': '4 Apr 2020'}